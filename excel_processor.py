@@ -1,10 +1,17 @@
 import json
+import os
+import shutil
+import tempfile
+import time
 from pathlib import Path
 import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+from filter_rules import MaxMultipleOfMin, RuleSet
 
 
 class ExcelProcessor:
-    def __init__(self, folder_path, column_name, processed_file="processed_files.json"):
+    def __init__(self, folder_path, column_name, processed_file="processed_files.json", rules=None):
         """
         Initialize the Excel processor.
         
@@ -12,9 +19,12 @@ class ExcelProcessor:
             folder_path: Path to the folder to monitor
             column_name: Name of the column to process
             processed_file: JSON file to store list of processed files
+            rules: Optional RuleSet to apply instead of the default
+                   "column_name <= 2x lowest" rule
         """
         self.folder_path = Path(folder_path)
         self.column_name = column_name
+        self.rules = rules if rules is not None else RuleSet([MaxMultipleOfMin(column_name, 2)])
         self.processed_file = Path(processed_file)
         self.processed_files = self.load_processed_files()
         
@@ -36,52 +46,168 @@ class ExcelProcessor:
         with open(self.processed_file, 'w') as f:
             json.dump(list(self.processed_files), f, indent=2)
     
-    def process_excel(self, file_path):
+    def _check_columns(self, columns, file_path):
+        """Return True if every rule column exists, otherwise print a warning."""
+        missing = [c for c in self.rules.columns if c not in columns]
+        if missing:
+            for column in missing:
+                print(f"Warning: Column '{column}' not found in {file_path.name}")
+            print(f"Available columns: {[c for c in columns if c is not None]}")
+            return False
+        return True
+    
+    def _scan_rule_columns(self, file_path):
         """
-        Process an Excel file:
-        1. Find the lowest value in the specified column
-        2. Keep values <= 2x the lowest value
-        3. Remove rows with values > 2x the lowest value
+        First pass: stream the sheet in read-only mode, checking the header
+        and keeping only the columns the rules reference.
+        
+        Returns a DataFrame with one row per data row, or None (after printing
+        a warning) if a rule column is missing. Like pandas.read_excel, blank
+        rows between data rows are kept (as all-None rows) and only trailing
+        blank rows are dropped.
         """
+        wb = load_workbook(file_path, read_only=True, data_only=True)
         try:
-            # Read the Excel file
-            df = pd.read_excel(file_path)
+            rows = wb.worksheets[0].iter_rows(values_only=True)
             
-            # Check if column exists
-            if self.column_name not in df.columns:
-                print(f"Warning: Column '{self.column_name}' not found in {file_path.name}")
-                print(f"Available columns: {list(df.columns)}")
-                return False
+            # Check if columns exist
+            header = list(next(rows, ()))
+            if not self._check_columns(header, file_path):
+                return None
             
-            # Get the column values (remove NaN values)
-            column_values = df[self.column_name].dropna()
+            indices = {column: header.index(column) for column in self.rules.columns}
+            data = {column: [] for column in indices}
+            pending_blank = 0
             
-            if len(column_values) == 0:
-                print(f"Warning: Column '{self.column_name}' is empty in {file_path.name}")
-                return False
+            for row in rows:
+                # Hold blank rows back until a later data row shows they are
+                # not trailing
+                if all(value is None for value in row):
+                    pending_blank += 1
+                    continue
+                for column, idx in indices.items():
+                    data[column].extend([None] * pending_blank)
+                    data[column].append(row[idx] if idx < len(row) else None)
+                pending_blank = 0
+        finally:
+            wb.close()
+        return pd.DataFrame(data)
+    
+    def _stream_filtered_rows(self, file_path, mask):
+        """
+        Second pass: stream rows kept by mask into a write-only workbook
+        next to the original, then atomically replace the original.
+        """
+        # A .tmp suffix keeps a leftover file (e.g. after a crash) out of the
+        # excel_extensions scan in process_all_new_files
+        fd, tmp_name = tempfile.mkstemp(prefix=".~", suffix=".tmp", dir=file_path.parent)
+        os.close(fd)
+        tmp_path = Path(tmp_name)
+        
+        try:
+            src = load_workbook(file_path, read_only=True, data_only=True)
+            dst = Workbook(write_only=True)
+            try:
+                src_ws = src.worksheets[0]
+                dst_ws = dst.create_sheet(title=src_ws.title)
+                rows = src_ws.iter_rows(values_only=True)
+                
+                header = next(rows, None)
+                if header is not None:
+                    dst_ws.append(header)
+                
+                for row_num, row in enumerate(rows):
+                    # Rows past the mask are the trailing blank rows the first
+                    # pass dropped
+                    if row_num >= len(mask):
+                        break
+                    if mask[row_num]:
+                        dst_ws.append(row)
+                
+                dst.save(tmp_path)
+            finally:
+                src.close()
+            
+            # mkstemp creates the file as 0600; keep the original's permissions
+            shutil.copymode(file_path, tmp_path)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+    
+    def _print_rule_report(self, report):
+        """Print rows removed and timing for each rule."""
+        for entry in report:
+            detail = f" [{entry['detail']}]" if entry['detail'] else ""
+            print(f"  Rule: {entry['rule']}{detail}")
+            print(f"    Rows removed: {entry['removed']} ({entry['seconds'] * 1000:.1f} ms)")
+            if entry['unparsed']:
+                print(f"    Warning: {entry['unparsed']} cell(s) are not numbers "
+                      f"(e.g. text like \"1,200\") and were removed by this rule")
+    
+    def process_excel(self, file_path):
+        """
+        Process an Excel file by applying the rule set in a single pass.
+        
+        With the default rules this:
+        1. Finds the lowest value in the specified column
+        2. Keeps values <= 2x the lowest value
+        3. Removes rows with values > 2x the lowest value
+        
+        .xlsx files are filtered in two streaming passes (each opens the file
+        once): the first pass checks the header, reads the columns the rules
+        need and builds one combined mask, the second streams the surviving
+        rows into a write-only workbook that replaces the original. Memory is
+        one row plus the rule columns, plus openpyxl's shared-strings table,
+        which both read-only and write-only workbooks keep in memory and which
+        grows with the number of unique strings. Legacy .xls files (which
+        openpyxl cannot stream) are read fully into memory with pandas.
+        """
+        try:
+            start = time.perf_counter()
+            is_xls = file_path.suffix.lower() == '.xls'
             
-            # Find the lowest value
-            lowest_value = column_values.min()
-            threshold = 2 * lowest_value
+            if is_xls:
+                df = pd.read_excel(file_path)
+                # Check if columns exist
+                if not self._check_columns(list(df.columns), file_path):
+                    return False
+            else:
+                # Pass 1: read the header and only the columns the rules need
+                df = self._scan_rule_columns(file_path)
+                if df is None:
+                    return False
             
-            print(f"Processing {file_path.name}:")
-            print(f"  Lowest value: {lowest_value}")
-            print(f"  Threshold (2x lowest): {threshold}")
+            try:
+                mask, report = self.rules.evaluate(df)
+            except ValueError as e:
+                print(f"Warning: {e} in {file_path.name}")
+                return False
             
-            # Filter rows: keep values <= 2x the lowest value
-            mask = df[self.column_name] <= threshold
-            rows_before = len(df)
-            df_filtered = df[mask].copy()
-            rows_after = len(df_filtered)
-            rows_removed = rows_before - rows_after
+            rows_before = len(mask)
+            rows_after = int(mask.sum())
             
+            print(f"Processing {file_path.name}:")
+            self._print_rule_report(report)
             print(f"  Rows before: {rows_before}")
             print(f"  Rows after: {rows_after}")
-            print(f"  Rows removed: {rows_removed}")
+            print(f"  Rows removed: {rows_before - rows_after}")
+            
+            # Never overwrite a file with a header-only sheet; an empty result
+            # almost always means a rule does not match the data
+            if rows_before > 0 and rows_after == 0:
+                print(f"  Warning: All rows would be removed, leaving {file_path.name} unchanged\n")
+                return False
             
             # Save the filtered data back to the Excel file
-            df_filtered.to_excel(file_path, index=False)
-            print(f"  ✓ Successfully processed and saved {file_path.name}\n")
+            if is_xls:
+                df[mask].to_excel(file_path, index=False)
+            else:
+                # Pass 2: stream kept rows and replace the file
+                self._stream_filtered_rows(file_path, mask)
+            
+            print(f"  ✓ Successfully processed and saved {file_path.name} "
+                  f"({time.perf_counter() - start:.2f} s)\n")
             
             return True
             
@@ -101,7 +227,7 @@ class ExcelProcessor:
             return
         
         print(f"Scanning folder: {self.folder_path}")
-        print(f"Column to process: {self.column_name}")
+        print(f"Rules: {'; '.join(str(rule) for rule in self.rules.rules)}")
         print(f"Processed files tracker: {self.processed_file}\n")
         
         for file_path in self.folder_path.iterdir():
@@ -130,7 +256,7 @@ class ExcelProcessor:
         print(f"{'='*50}")
 
 
-def process_folder(folder_path, column_name, processed_file="processed_files.json"):
+def process_folder(folder_path, column_name, processed_file="processed_files.json", rules=None):
     """
     Process all new Excel files in a folder.
     
@@ -138,13 +264,14 @@ def process_folder(folder_path, column_name, processed_file="processed_files.jso
         folder_path: Path to the folder to process
         column_name: Name of the column to process
         processed_file: JSON file to store list of processed files
+        rules: Optional RuleSet to apply instead of the default 2x-lowest rule
     """
-    processor = ExcelProcessor(folder_path, column_name, processed_file)
+    processor = ExcelProcessor(folder_path, column_name, processed_file, rules)
     processor.process_all_new_files()
 
 
 if __name__ == "__main__":
-    import sys
+    import argparse
 
     # Configuration - updated as per instructions
     FOLDER_PATH = r"C:\Users\kkhus\Downloads\excels"  # Updated folder path
@@ -152,12 +279,28 @@ if __name__ == "__main__":
     PROCESSED_FILE = "processed_files.json"  # File to track processed files
     
     # Allow command line arguments
-    if len(sys.argv) > 1:
-        FOLDER_PATH = sys.argv[1]
-    if len(sys.argv) > 2:
-        COLUMN_NAME = sys.argv[2]
-    if len(sys.argv) > 3:
-        PROCESSED_FILE = sys.argv[3]
+    parser = argparse.ArgumentParser(description="Filter rows of new Excel files in a folder.")
+    parser.add_argument("folder_path", nargs="?", default=FOLDER_PATH)
+    parser.add_argument("column_name", nargs="?", default=None)
+    parser.add_argument("processed_file", nargs="?", default=PROCESSED_FILE)
+    parser.add_argument("--rules", help="JSON file with a list of filter rules")
+    parser.add_argument("--rule", action="append", default=[],
+                        help='Compact rule "type:column:arg[:arg]" (repeatable), e.g. "equals:Fits Budget:Yes"')
+    args = parser.parse_args()
+    
+    try:
+        rule_list = RuleSet.from_file(args.rules).rules if args.rules else []
+        rule_list += RuleSet.from_strings(args.rule).rules
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    
+    if args.rules and not rule_list:
+        parser.error(f"Rules file '{args.rules}' contains no rules")
+    rules = RuleSet(rule_list) if rule_list else None
+    
+    if rules is not None and args.column_name is not None:
+        print(f"Warning: column_name '{args.column_name}' is ignored when --rule/--rules are given; "
+              f"set the column inside each rule instead\n")
     
     # Process files in folder
-    process_folder(FOLDER_PATH, COLUMN_NAME, PROCESSED_FILE)
+    process_folder(args.folder_path, args.column_name or COLUMN_NAME, args.processed_file, rules)
@@ -0,0 +1,338 @@
+"""
+Filter Rules
+Declarative row filters for Excel result sheets.
+
+Each rule looks at one or more columns of a DataFrame and returns a boolean
+"keep" mask. A RuleSet evaluates all of its rules against the same data and
+combines them into a single mask (a row is kept only if every rule keeps it),
+so any number of rules costs one read/write pass per file.
+
+Rules can be loaded from a JSON file:
+
+    [
+        {"type": "max_multiple_of_min", "column": "Total Cost (INR)", "factor": 2},
+        {"type": "max_multiple_of_min", "column": "Total Cost (INR)", "group_by": "Voice Agent"},
+        {"type": "top_k", "column": "Score", "k": 50},
+        {"type": "percentile", "column": "Total Cost (INR)", "percentile": 90},
+        {"type": "equals", "column": "Fits Budget", "value": "Yes"}
+    ]
+
+or from compact command line specs of the form "type:column:arg[:arg]",
+e.g. "top_k:Score:50" or "equals:Fits Budget:Yes".
+"""
+
+import inspect
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+def _numeric(df, column):
+    """Return a column as floats, with non-numeric cells as NaN."""
+    values = df[column]
+    # to_numeric would read TRUE/FALSE cells as 1/0; treat them as non-numeric
+    is_bool = values.map(lambda v: isinstance(v, (bool, np.bool_)))
+    return pd.to_numeric(values.astype(object).mask(is_bool), errors='coerce')
+
+
+def _unparsed_count(df, column):
+    """Count non-blank cells in a column that could not be read as numbers."""
+    return int((df[column].notna() & _numeric(df, column).isna()).sum())
+
+
+class MaxMultipleOfMin:
+    """Keep rows where column <= factor x the lowest value (optionally per group)."""
+
+    type_name = "max_multiple_of_min"
+
+    def __init__(self, column, factor=2, group_by=None):
+        self.column = column
+        self.factor = float(factor)
+        self.group_by = group_by
+        self.columns = [column] + ([group_by] if group_by else [])
+        self.numeric_columns = [column]
+
+    def __str__(self):
+        rule = f"{self.column} <= {self.factor:g}x lowest"
+        if self.group_by:
+            rule += f" per {self.group_by}"
+        return rule
+
+    def evaluate(self, df):
+        values = _numeric(df, self.column)
+        if values.notna().sum() == 0:
+            raise ValueError(f"Column '{self.column}' is empty")
+
+        if self.group_by:
+            # dropna=False puts rows with a blank group in their own group
+            # instead of giving them a NaN minimum (which drops them)
+            lowest = values.groupby(df[self.group_by], dropna=False).transform('min')
+            return (values <= self.factor * lowest).to_numpy(), ""
+
+        lowest = values.min()
+        threshold = self.factor * lowest
+        return (values <= threshold).to_numpy(), f"lowest {lowest:g}, threshold {threshold:g}"
+
+
+class TopK:
+    """Keep the k rows with the highest (or lowest) values in a column."""
+
+    type_name = "top_k"
+
+    def __init__(self, column, k, largest=True):
+        self.column = column
+        self.k = int(k)
+        if self.k < 1:
+            raise ValueError(f"top_k 'k' must be at least 1, got {self.k}")
+        if isinstance(largest, str):
+            tokens = {"highest": True, "true": True, "lowest": False, "false": False}
+            if largest.lower() not in tokens:
+                raise ValueError(f"top_k 'largest' must be 'highest', 'lowest', 'true' or 'false', "
+                                 f"got '{largest}'")
+            largest = tokens[largest.lower()]
+        elif not isinstance(largest, bool):
+            raise ValueError(f"top_k 'largest' must be true or false, got {largest!r}")
+        self.largest = largest
+        self.columns = [column]
+        self.numeric_columns = [column]
+
+    def __str__(self):
+        return f"top {self.k} by {self.column} ({'highest' if self.largest else 'lowest'})"
+
+    def evaluate(self, df):
+        values = _numeric(df, self.column)
+        # method='first' breaks ties by row order so exactly k rows survive
+        rank = values.rank(ascending=not self.largest, method='first')
+        return (rank <= self.k).to_numpy(), ""
+
+
+class Percentile:
+    """Keep rows at or below (or at or above) a percentile of a column."""
+
+    type_name = "percentile"
+
+    def __init__(self, column, percentile, keep="below"):
+        if keep not in ("below", "above"):
+            raise ValueError(f"percentile 'keep' must be 'below' or 'above', got '{keep}'")
+        self.column = column
+        self.percentile = float(percentile)
+        if not 0 <= self.percentile <= 100:
+            raise ValueError(f"percentile must be between 0 and 100, got {self.percentile:g}")
+        self.keep = keep
+        self.columns = [column]
+        self.numeric_columns = [column]
+
+    def __str__(self):
+        op = "<=" if self.keep == "below" else ">="
+        return f"{self.column} {op} p{self.percentile:g}"
+
+    def evaluate(self, df):
+        values = _numeric(df, self.column)
+        if values.notna().sum() == 0:
+            raise ValueError(f"Column '{self.column}' is empty")
+
+        cutoff = values.quantile(self.percentile / 100)
+        mask = values <= cutoff if self.keep == "below" else values >= cutoff
+        return mask.to_numpy(), f"cutoff {cutoff:g}"
+
+
+class Equals:
+    """Keep rows where a column equals a fixed value (e.g. Fits Budget == Yes)."""
+
+    type_name = "equals"
+
+    def __init__(self, column, value):
+        self.column = column
+        self.value = value
+        self.columns = [column]
+        self.numeric_columns = []
+
+    def __str__(self):
+        return f"{self.column} == {self.value!r}"
+
+    def _coerce_value(self, column):
+        """
+        Convert a string value (e.g. from the command line) to the column's
+        type, so "3" matches numeric cells and "TRUE" matches boolean cells.
+        """
+        if not isinstance(self.value, str):
+            return self.value
+
+        non_null = column.dropna()
+        if len(non_null) == 0:
+            return self.value
+
+        if non_null.map(lambda v: isinstance(v, (bool, np.bool_))).all():
+            lowered = self.value.strip().lower()
+            if lowered in ("true", "yes", "1"):
+                return True
+            if lowered in ("false", "no", "0"):
+                return False
+            raise ValueError(f"Column '{self.column}' is boolean but rule value is {self.value!r}")
+
+        if pd.to_numeric(non_null, errors='coerce').notna().all():
+            try:
+                return float(self.value)
+            except ValueError:
+                raise ValueError(f"Column '{self.column}' is numeric but rule value is {self.value!r}")
+
+        return self.value
+
+    def evaluate(self, df):
+        column = df[self.column]
+        value = self._coerce_value(column)
+        if isinstance(value, float):
+            column = _numeric(df, self.column)
+        return (column == value).to_numpy(), ""
+
+
+RULE_TYPES = {rule.type_name: rule for rule in (MaxMultipleOfMin, TopK, Percentile, Equals)}
+
+
+def _build_rule(rule_class, spec, args=(), kwargs=None):
+    """
+    Construct a rule, turning bad arguments into a ValueError that names
+    the offending spec.
+    """
+    kwargs = kwargs or {}
+    signature = inspect.signature(rule_class.__init__)
+    try:
+        signature.bind(None, *args, **kwargs)
+    except TypeError:
+        params = list(signature.parameters.values())[1:]
+        expected = ", ".join(
+            p.name if p.default is inspect.Parameter.empty else f"[{p.name}]" for p in params
+        )
+        raise ValueError(f"Invalid rule {spec!r}: {rule_class.type_name} expects {expected}")
+
+    try:
+        return rule_class(*args, **kwargs)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid rule {spec!r}: {e}")
+
+
+def rule_from_dict(spec):
+    """
+    Build a rule from a dict such as {"type": "top_k", "column": "Score", "k": 10}.
+
+    Args:
+        spec: Dict with a "type" key plus that rule's arguments
+
+    Returns:
+        Rule instance
+    """
+    if not isinstance(spec, dict):
+        raise ValueError(f"Invalid rule {spec!r}: expected an object with a \"type\" key")
+
+    kwargs = dict(spec)
+    rule_type = kwargs.pop("type", None)
+    if rule_type not in RULE_TYPES:
+        raise ValueError(f"Unknown rule type '{rule_type}'. Available: {list(RULE_TYPES)}")
+    return _build_rule(RULE_TYPES[rule_type], spec, kwargs=kwargs)
+
+
+def rule_from_string(spec):
+    """
+    Build a rule from a compact "type:column:arg[:arg]" string.
+
+    Examples:
+        "max_multiple_of_min:Total Cost (INR):2"
+        "max_multiple_of_min:Total Cost (INR):2:Voice Agent"
+        "top_k:Score:10"
+        "top_k:Total Cost (INR):10:lowest"
+        "percentile:Total Cost (INR):90:below"
+        "equals:Fits Budget:Yes"
+    """
+    rule_type, _, rest = spec.partition(":")
+    if rule_type not in RULE_TYPES:
+        raise ValueError(f"Unknown rule type '{rule_type}'. Available: {list(RULE_TYPES)}")
+
+    # Column names may contain spaces and parentheses but not ':'
+    parts = rest.split(":")
+    if not parts[0]:
+        raise ValueError(f"Rule '{spec}' is missing a column name")
+    return _build_rule(RULE_TYPES[rule_type], spec, args=parts)
+
+
+class RuleSet:
+    """An ordered collection of rules applied together as one mask."""
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+
+    @classmethod
+    def from_file(cls, path):
+        """Load rules from a JSON file containing a list of rule dicts."""
+        with open(Path(path), 'r') as f:
+            try:
+                specs = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Rules file '{path}' is not valid JSON: {e}")
+
+        if not isinstance(specs, list):
+            raise ValueError(f"Rules file '{path}' must contain a list of rules, "
+                             f"got {type(specs).__name__}")
+        return cls(rule_from_dict(spec) for spec in specs)
+
+    @classmethod
+    def from_strings(cls, specs):
+        """Build rules from compact command line specs."""
+        return cls(rule_from_string(spec) for spec in specs)
+
+    @property
+    def columns(self):
+        """Columns referenced by any rule, in first-use order."""
+        columns = []
+        for rule in self.rules:
+            for column in rule.columns:
+                if column not in columns:
+                    columns.append(column)
+        return columns
+
+    def evaluate(self, df):
+        """
+        Evaluate every rule against df and combine the results.
+
+        All rules see the same, unfiltered data, so the result does not
+        depend on rule order.
+
+        Args:
+            df: DataFrame containing at least the columns in self.columns
+
+        Returns:
+            (mask, report) where mask is a boolean numpy array of rows to keep
+            and report is a list of dicts with "rule", "detail", "removed"
+            (rows that rule alone rejects), "unparsed" (non-blank cells in the
+            rule's numeric columns that are not numbers and so never pass the
+            rule) and "seconds" per rule
+        """
+        keep = np.ones(len(df), dtype=bool)
+        report = []
+
+        for rule in self.rules:
+            start = time.perf_counter()
+            mask, detail = rule.evaluate(df)
+            seconds = time.perf_counter() - start
+            keep &= mask
+            report.append({
+                "rule": str(rule),
+                "detail": detail,
+                "removed": int(len(mask) - mask.sum()),
+                "unparsed": sum(_unparsed_count(df, column) for column in rule.numeric_columns),
+                "seconds": seconds,
+            })
+
+        return keep, report
+
+    def apply(self, df):
+        """
+        Filter a DataFrame in memory, for use inside other pipelines.
+
+        Returns:
+            (filtered DataFrame, report) - see evaluate() for the report format
+        """
+        mask, report = self.evaluate(df)
+        return df[mask], report